@@ -1,6 +1,6 @@
 """Test the subprocess wrapper without actually invoking arduino-cli."""
 
-from unittest.mock import patch, MagicMock
+from unittest.mock import patch, AsyncMock, MagicMock
 
 import pytest
 
@@ -12,41 +12,75 @@ def server(tmp_path):
     return ArduinoCliServer(workdir=str(tmp_path))
 
 
-def _fake_run(returncode=0, stdout="ok", stderr=""):
-    result = MagicMock()
-    result.returncode = returncode
-    result.stdout = stdout
-    result.stderr = stderr
-    return result
+class _FakeStream:
+    """Async-iterable stand-in for an asyncio subprocess pipe."""
 
+    def __init__(self, data):
+        self._lines = iter(data.splitlines(keepends=True))
 
-def test_execute_cli_command_invokes_arduino_cli(server):
-    with patch("arduino_cli_mcp.main.subprocess.run") as run:
-        run.return_value = _fake_run(stdout="arduino-cli 1.2.3")
-        out = server.execute_cli_command("version")
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        try:
+            return next(self._lines)
+        except StopIteration:
+            raise StopAsyncIteration
+
+
+def _fake_proc(returncode=0, stdout=b"ok", stderr=b""):
+    proc = MagicMock()
+    proc.returncode = returncode
+    proc.stdout = _FakeStream(stdout)
+    proc.stderr = _FakeStream(stderr)
+    proc.wait = AsyncMock(return_value=returncode)
+    return proc
+
+
+async def test_execute_cli_command_invokes_arduino_cli(server):
+    with patch("arduino_cli_mcp.main.asyncio.create_subprocess_exec", new=AsyncMock()) as exec_mock:
+        exec_mock.return_value = _fake_proc(stdout=b"arduino-cli 1.2.3")
+        out = await server.execute_cli_command("version")
 
     assert out.success is True
     assert out.output == "arduino-cli 1.2.3"
-    args_passed = run.call_args.args[0]
+    args_passed = exec_mock.call_args.args
     assert args_passed[0] == "arduino-cli"
     assert "version" in args_passed
 
 
-def test_execute_cli_command_reports_failure(server):
-    with patch("arduino_cli_mcp.main.subprocess.run") as run:
-        run.return_value = _fake_run(returncode=1, stderr="boom")
-        out = server.execute_cli_command("bogus")
+async def test_execute_cli_command_reports_failure(server):
+    with patch("arduino_cli_mcp.main.asyncio.create_subprocess_exec", new=AsyncMock()) as exec_mock:
+        exec_mock.return_value = _fake_proc(returncode=1, stderr=b"boom")
+        out = await server.execute_cli_command("bogus")
 
     assert out.success is False
     assert "boom" in out.error
 
 
-def test_user_input_does_not_inject_extra_flags(server):
+async def test_user_input_does_not_inject_extra_flags(server):
     """A malicious platform_id must not smuggle extra CLI flags through."""
-    with patch("arduino_cli_mcp.main.subprocess.run") as run:
-        run.return_value = _fake_run()
-        server.install_platform("esp32:esp32 --config-file /etc/passwd")
+    with patch("arduino_cli_mcp.main.asyncio.create_subprocess_exec", new=AsyncMock()) as exec_mock:
+        exec_mock.return_value = _fake_proc()
+        await server.install_platform("esp32:esp32 --config-file /etc/passwd")
 
-    tokens = run.call_args.args[0]
+    tokens = exec_mock.call_args.args
     assert "--config-file" not in tokens
     assert "/etc/passwd" not in tokens
+
+
+async def test_compile_many_runs_all_sketches(server, tmp_path):
+    sketches = []
+    for name in ("a", "b"):
+        sketch_dir = tmp_path / name
+        sketch_dir.mkdir()
+        sketch = sketch_dir / f"{name}.ino"
+        sketch.write_text("void setup() {}\nvoid loop() {}\n")
+        sketches.append(str(sketch))
+
+    with patch("arduino_cli_mcp.main.asyncio.create_subprocess_exec", new=AsyncMock()) as exec_mock:
+        exec_mock.return_value = _fake_proc(stdout=b"compiled")
+        results = await server.compile_many(sketches, fqbn="arduino:avr:uno")
+
+    assert len(results) == 2
+    assert all(r.success for r in results)